@@ -3,18 +3,36 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import _http_client, credentials, db, exceptions
+import orjson
 import pandas as pd
+from requests.adapters import HTTPAdapter
 import streamlit as st
+import heapq
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# firebase_admin decodes Realtime Database responses with the stdlib json module;
+# orjson parses large payment payloads several times faster
+if hasattr(db, "_Client"):
+    db._Client.parse_body = lambda self, resp: orjson.loads(resp.content)
+
 # Load Firebase configuration from environment variables or Streamlit secrets
 firebase_cert_source = os.environ.get("FIREBASE_CERT_PATH") or st.secrets.get("FIREBASE_CERT_JSON")
 firebase_db_url = os.environ.get("FIREBASE_DB_URL") or st.secrets.get("FIREBASE_DB_URL")
+# Opt-in: mirror /payments in memory via a realtime listener instead of querying per fetch.
+# The listener syncs the whole node once per process, so only for small /payments trees.
+stream_payments = os.environ.get("FIREBASE_STREAM_PAYMENTS") or st.secrets.get("FIREBASE_STREAM_PAYMENTS")
+# Opt-in: only once the payment writer stores (and has backfilled) the composite
+# index keys below and the database rules index them
+composite_index_keys = os.environ.get("FIREBASE_COMPOSITE_KEYS") or st.secrets.get("FIREBASE_COMPOSITE_KEYS")
 
 logging.info("Firebase DB URL: %s", firebase_db_url)
 
@@ -22,41 +40,38 @@ if not firebase_cert_source or not firebase_db_url:
     st.error("Firebase configuration is missing. Set FIREBASE_CERT_JSON (as dict) and FIREBASE_DB_URL in your secrets.")
     st.stop()
 
-# Convert to a regular dict if it's not one already 
-if not isinstance(firebase_cert_source, dict):
-    try:
-        firebase_cert_source = dict(firebase_cert_source)
-        logging.info("Converted firebase_cert_source to dict successfully.")
-    except Exception as e:
-        logging.error("Failed to convert certificate source to dict: %s", e)
-        st.error("Failed to convert certificate source to dict: " + str(e))
-        st.stop()
-
-# Replace escaped newline characters with actual newlines in the private_key field
-if "private_key" in firebase_cert_source:
-    firebase_cert_source["private_key"] = firebase_cert_source["private_key"].replace("\\n", "\n")
-    logging.info("Processed private_key newlines.")
-
-# Initialize Firebase credentials
-try:
-    cred = credentials.Certificate(firebase_cert_source)
+def load_certificate(source):
+    """Service-account info as a plain dict with real newlines in private_key"""
+    # Convert to a regular dict if it's not one already 
+    cert = dict(source)
+    logging.info("Converted firebase_cert_source to dict successfully.")
+    
+    # Replace escaped newline characters with actual newlines in the private_key field
+    if "private_key" in cert:
+        cert["private_key"] = cert["private_key"].replace("\\n", "\n")
+        logging.info("Processed private_key newlines.")
+    return cert
+
+# Initialize Firebase Admin once per process and share the app across sessions/reruns;
+# the certificate is only converted and parsed on that first run
+@st.cache_resource
+def init_firebase():
+    """Create the certificate credential and initialize the Firebase Admin app"""
+    cred = credentials.Certificate(load_certificate(firebase_cert_source))
     logging.info("Certificate credential initialized successfully.")
-except Exception as e:
-    logging.error("Failed to initialize certificate credential: %s", e)
-    st.error("Failed to initialize certificate credential: " + str(e))
-    st.stop()
-
-# Initialize Firebase Admin (only once)
-try:
     try:
-        firebase_admin.initialize_app(cred, {'databaseURL': firebase_db_url})
+        app = firebase_admin.initialize_app(cred, {'databaseURL': firebase_db_url})
         logging.info("Firebase Admin initialized successfully.")
     except ValueError:
         logging.info("Firebase Admin already initialized. Using existing app.")
-        firebase_admin.get_app()
+        app = firebase_admin.get_app()
+    return app
+
+try:
+    init_firebase()
 except Exception as e:
     logging.error("Error initializing Firebase Admin: %s", e)
-    st.error("Firebase initialization failed. Check your configuration.")
+    st.error("Firebase initialization failed: " + str(e))
     st.stop()
 
 logging.info("Firebase Admin setup complete.")
@@ -67,81 +82,335 @@ def get_database():
 
 database = get_database()
 
+# Keep-alive connections held open to the database host. firebase_admin's default
+# adapter keeps 10, fewer than the concurrent reads the executor can issue, so
+# extra connections would be torn down (and re-handshaked) after each burst
+HTTP_POOL_SIZE = 20
+
+def _widen_http_pool(ref):
+    """Remount the firebase_admin session adapter with a larger connection pool"""
+    session = getattr(getattr(ref, "_client", None), "session", None)
+    if session is None:
+        return
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        max_retries=_http_client.DEFAULT_RETRY_CONFIG,
+    )
+    session.mount("https://", adapter)
+
+# References are created once per process; every fetch goes through the same
+# firebase_admin client and its pooled HTTP session
+@st.cache_resource
+def get_refs():
+    """Shared references to /payments and /USER_PROFILES"""
+    payments, profiles = database.reference("payments"), database.reference("USER_PROFILES")
+    # Both references share the app's single database client
+    _widen_http_pool(payments)
+    return payments, profiles
+
+PAYMENTS_REF, PROFILES_REF = get_refs()
+
+# Timestamps are shown in UTC+5, built once instead of per call
+_TZ_OFFSET = timedelta(hours=5)
+_DISPLAY_TZ = timezone(_TZ_OFFSET)
+_FMT = '%H:%M:%S %Y-%m-%d'
+
+# The same join/activity timestamps are formatted again on every rerun
 def format_timestamp(timestamp):
     """Convert timestamp to readable format with timezone adjustment"""
-    if pd.notna(timestamp) and timestamp != 0:
+    try:
+        hash(timestamp)
+    except TypeError:
+        # e.g. a dict or list stored where a timestamp was expected; lru_cache can't key on it
+        return "Invalid date"
+    return _format_timestamp(timestamp)
+
+@lru_cache(maxsize=4096)
+def _format_timestamp(timestamp):
+    # None, pd.NA, NaN (x != x) and 0 all mean "no timestamp"
+    if timestamp is None or timestamp is pd.NA or timestamp != timestamp or timestamp == 0:
+        return "Not available"
+    try:
+        # Convert straight into the display timezone (no local-time lookup)
+        return datetime.fromtimestamp(timestamp * 0.001, _DISPLAY_TZ).strftime(_FMT)
+    except (ValueError, TypeError, OverflowError, OSError):
+        return "Invalid date"
+
+# Tables here hold at most ~100 rows, where pandas' C datetime kernels are already
+# far below render cost. Only if payment tables regularly reach ~50k rows is a
+# compiled (e.g. Numba civil-from-days) formatter worth its extra dependency.
+def format_timestamp_series(timestamps):
+    """Vectorized format_timestamp for a whole column of timestamps"""
+    try:
+        numeric = pd.to_numeric(timestamps, errors='coerce')
+        dt = pd.to_datetime(numeric, unit='ms', errors='coerce') + _TZ_OFFSET
+    except (OverflowError, ValueError):
+        # Out-of-range values can't be represented as datetime64; format row by row
+        return timestamps.apply(format_timestamp)
+    formatted = dt.dt.strftime(_FMT).fillna("Invalid date")
+    return formatted.mask(timestamps.isna() | (numeric == 0), "Not available")
+
+def cents_to_usd(amounts):
+    """Convert a column of amounts in cents to float dollars (1999 -> 19.99)"""
+    return pd.to_numeric(amounts, errors='coerce').fillna(0) / 100
+
+# Dollar columns stay numeric and are formatted client-side by st.dataframe
+USD_COLUMN_CONFIG = {
+    "Amount_USD": st.column_config.NumberColumn(format="$%.2f"),
+    "Payment_Amount_USD": st.column_config.NumberColumn(format="$%.2f"),
+}
+
+# Composite "<status>_<processedAt>" / "<userId>_<processedAt>" children written
+# alongside each payment, so one indexed range query can return only the newest
+# payments with a given status or for a given user. processedAt is zero-padded to
+# 13 digits so keys sort chronologically.
+# Requires ".indexOn": ["statusProcessedAt", "userId_processedAt"] on /payments
+# in the database rules; only queried when FIREBASE_COMPOSITE_KEYS is set.
+# Nothing writes these children yet: until the payment writer stores them, the
+# composite branches below are dead code and the flag must stay off.
+STATUS_PROCESSED_AT_KEY = "statusProcessedAt"
+USER_PROCESSED_AT_KEY = "userId_processedAt"
+
+def _with_path(node, parts, value):
+    """Return a copy of `node` with `value` set at the child path `parts` (None deletes)"""
+    if not parts:
+        return value
+    node = dict(node) if isinstance(node, dict) else {}
+    child = _with_path(node.get(parts[0]), parts[1:], value)
+    if child is None:
+        node.pop(parts[0], None)
+    else:
+        node[parts[0]] = child
+    return node
+
+# Seconds a fetch waits for the listener's initial sync of /payments before
+# querying instead; the sync keeps running in the background
+LISTENER_SYNC_WAIT = 0.2
+
+class PaymentsStore:
+    """In-memory mirror of /payments kept current by a Realtime Database listener"""
+
+    def __init__(self, ref):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._failed = False
+        self._payments = {}
+        self._registration = ref.listen(self._on_event)
+
+    def _on_event(self, event):
         try:
-            # Convert to datetime
-            dt = datetime.fromtimestamp(timestamp/1000)
-            # Add 5 hours to adjust for timezone
-            dt = dt + timedelta(hours=5)
-            return dt.strftime('%H:%M:%S %Y-%m-%d')
-        except (ValueError, TypeError):
-            return "Invalid date"
-    return "Not available"
+            parts = [p for p in event.path.split("/") if p]
+            with self._lock:
+                if event.event_type == "put":
+                    self._apply(parts, event.data)
+                elif event.event_type == "patch":
+                    for key, value in (event.data or {}).items():
+                        self._apply(parts + [p for p in key.split("/") if p], value)
+        except Exception as e:
+            # The mirror may now be missing this update; stop serving it
+            logging.error(f"Payments listener failed to apply an event: {e}")
+            self._failed = True
+            return
+        self._ready.set()
+
+    def _apply(self, parts, value):
+        if not parts:
+            self._payments = dict(value) if isinstance(value, dict) else {}
+            return
+        # Payments are replaced, never mutated, so snapshots stay safe to read unlocked
+        payment = _with_path(self._payments.get(parts[0]), parts[1:], value)
+        if payment is None:
+            self._payments.pop(parts[0], None)
+        else:
+            self._payments[parts[0]] = payment
+
+    def healthy(self):
+        """False once an event failed to apply or the listener thread has exited
+        (e.g. the stream dropped and couldn't reconnect)"""
+        thread = getattr(self._registration, "_thread", None)
+        return not self._failed and (thread is None or thread.is_alive())
+
+    def close(self):
+        self._registration.close()
+
+    def snapshot(self, timeout=LISTENER_SYNC_WAIT):
+        """Current {payment_id: payment} mapping, or None if the mirror can't be trusted yet"""
+        if not self.healthy() or not self._ready.wait(timeout):
+            return None
+        with self._lock:
+            return dict(self._payments)
+
+# One listener per Streamlit worker process
+@st.cache_resource
+def get_payments_store():
+    return PaymentsStore(PAYMENTS_REF)
+
+def payments_snapshot():
+    """Listener mirror of /payments, or None to fall back to queries.
+
+    A dead listener is dropped here so the next call starts a fresh one.
+    """
+    try:
+        store = get_payments_store()
+    except Exception as e:
+        # st.cache_resource doesn't cache the failure, so the next call retries listen()
+        logging.error(f"Error starting payments listener: {e}")
+        return None
+    if not store.healthy():
+        logging.warning("Payments listener stopped, restarting it")
+        get_payments_store.clear()
+        # close() joins the listener thread; don't block the script on it
+        threading.Thread(target=store.close, daemon=True).start()
+        return None
+    return store.snapshot()
+
+# Upper bound on records pulled by fallback scans when an indexed query can't be used
+MAX_FALLBACK = 5000
+
+# Backoff (seconds) between attempts of an indexed query
+QUERY_RETRY_DELAYS = (0.2, 0.8)
 
+def warn_if_capped(data, what):
+    """Log when a MAX_FALLBACK-capped query came back full and may have missed payments"""
+    if isinstance(data, dict) and len(data) >= MAX_FALLBACK:
+        # Ties on `status` are ordered by key, so the cap keeps the highest push keys,
+        # not necessarily the newest processedAt
+        logging.warning(
+            f"{what} hit the {MAX_FALLBACK}-payment cap; older or out-of-order payments may be missing"
+        )
+
+def get_with_retry(query):
+    """query.get(), retried with backoff when the connection to Firebase fails"""
+    for delay in QUERY_RETRY_DELAYS:
+        try:
+            return query.get()
+        except exceptions.UnavailableError as e:
+            # Only connection-level failures (no HTTP response) are retried here:
+            # firebase_admin's transport already retried 500/503 with backoff, and
+            # timeouts or other errors (e.g. a missing .indexOn) aren't worth repeating
+            if e.http_response is not None:
+                raise
+            logging.warning(f"Firebase connection failed, retrying in {delay}s: {e}")
+            time.sleep(delay)
+    return query.get()
+
+# Recent completed payments read once and shared by the challengers and
+# completed-payments sections (oversampled so it usually covers 20 distinct payers)
+COMPLETED_PAYMENTS_WINDOW = 100
+
+@st.cache_data(ttl=60, show_spinner=False)
 def fetch_recent_completed_payments(limit=20):
-    """Fetch the most recent `limit` payments whose status == 'completed'."""
+    """Fetch the most recent `limit` payments whose status == 'completed'.
+
+    Returns None if the read failed (as opposed to {} when there are none).
+    """
     try:
-        ref = database.reference("payments")
-        # This uses your indexed `status` field to only pull completed payments
-        query = ref.order_by_child("status").equal_to("completed")
-        completed_data = query.get()
+        if stream_payments:
+            # Zero-RTT read from the listener-maintained mirror
+            snapshot = payments_snapshot()
+            if snapshot is not None:
+                completed = (
+                    (pid, pdata) for pid, pdata in snapshot.items()
+                    if type(pdata) is dict and pdata.get("status") == "completed"
+                )
+                return dict(heapq.nlargest(limit, completed, key=lambda kv: kv[1].get("processedAt", 0)))
+            logging.warning("Payments listener not available, querying Firebase directly")
+
+        ref = PAYMENTS_REF
+        completed_data = None
+        if composite_index_keys:
+            try:
+                # Dead path until the payment writer stores STATUS_PROCESSED_AT_KEY.
+                # Only the newest `limit` completed payments leave the server
+                query = (
+                    ref.order_by_child(STATUS_PROCESSED_AT_KEY)
+                    .start_at("completed_0000000000000")
+                    .end_at("completed_9999999999999")
+                    .limit_to_last(limit)
+                )
+                completed_data = get_with_retry(query)
+                if isinstance(completed_data, dict):
+                    # The range matches a key prefix, not the status itself
+                    completed_data = {
+                        pid: pdata for pid, pdata in completed_data.items()
+                        if type(pdata) is dict and pdata.get("status") == "completed"
+                    }
+            except Exception as e:
+                logging.warning(f"{STATUS_PROCESSED_AT_KEY} query failed, falling back to status index: {e}")
+
+        if completed_data is None:
+            # This uses your indexed `status` field to only pull completed payments
+            query = ref.order_by_child("status").equal_to("completed").limit_to_last(MAX_FALLBACK)
+            completed_data = get_with_retry(query)
+            warn_if_capped(completed_data, "Completed payments query")
 
         if not completed_data or not isinstance(completed_data, dict):
             logging.info("No completed payments found")
-            return []
+            return {}
 
-        # Turn into list and sort by processedAt descending
-        payments = [
-            {"payment_id": pid, **pdata}
-            for pid, pdata in completed_data.items()
-            if isinstance(pdata, dict)
-        ]
-        payments.sort(key=lambda x: x.get("processedAt", 0), reverse=True)
+        # Keep the raw {payment_id: payment} mapping; to_payments_df builds the table
+        payments = {pid: pdata for pid, pdata in completed_data.items() if type(pdata) is dict}
+        if len(payments) > limit:
+            # The status index returns every completed payment; keep only the newest `limit`
+            payments = dict(heapq.nlargest(limit, payments.items(), key=lambda kv: kv[1].get("processedAt", 0)))
 
-        return payments[:limit]
+        return payments
 
     except Exception as e:
         logging.error(f"Error fetching completed payments: {e}")
-        return []
+        return None
 
+@st.cache_data(ttl=60, show_spinner=False)
 def fetch_user_payments(user_id, limit=20):
     """Fetch payments for a specific user using indexed query"""
     try:
-        ref = database.reference("payments")
+        ref = PAYMENTS_REF
+        user_payments = None
+        if composite_index_keys:
+            try:
+                # Dead path until the payment writer stores USER_PROCESSED_AT_KEY.
+                # Only this user's newest `limit` payments leave the server
+                query = (
+                    ref.order_by_child(USER_PROCESSED_AT_KEY)
+                    .start_at(f"{user_id}_0000000000000")
+                    .end_at(f"{user_id}_9999999999999")
+                    .limit_to_last(limit)
+                )
+                user_payments = get_with_retry(query)
+                if isinstance(user_payments, dict):
+                    # The key range can still cover user IDs like "<user_id>_1x"
+                    user_payments = {
+                        pid: pdata for pid, pdata in user_payments.items()
+                        if type(pdata) is dict and pdata.get("userId") == user_id
+                    }
+            except Exception as e:
+                logging.warning(f"{USER_PROCESSED_AT_KEY} query failed for user {user_id}: {e}")
         
-        # Use indexed query to get payments for specific user
-        query = ref.order_by_child("userId").equal_to(user_id).limit_to_last(limit)
-        user_payments = query.get()
+        if not user_payments:
+            # This uses your indexed `userId` field
+            query = ref.order_by_child("userId").equal_to(user_id).limit_to_last(limit)
+            user_payments = get_with_retry(query)
         
         if not user_payments:
             logging.info(f"No payments found for user {user_id}")
-            return []
+            return {}
         
-        payments_list = []
-        for payment_id, payment_data in user_payments.items():
-            if isinstance(payment_data, dict):
-                payment_record = {
-                    "payment_id": payment_id,
-                    **payment_data
-                }
-                payments_list.append(payment_record)
+        # Keep the raw {payment_id: payment} mapping; to_payments_df sorts and builds the table
+        payments = {pid: pdata for pid, pdata in user_payments.items() if type(pdata) is dict}
         
-        # Sort by processedAt (most recent first)
-        payments_list.sort(key=lambda x: x.get("processedAt", 0), reverse=True)
-        
-        logging.info(f"Found {len(payments_list)} payments for user {user_id}")
-        return payments_list
+        logging.info(f"Found {len(payments)} payments for user {user_id}")
+        return payments
         
     except Exception as e:
         logging.error(f"Error fetching payments for user {user_id}: {e}")
-        return []
+        return {}
 
+@st.cache_data(ttl=300, show_spinner=False)
 def fetch_user_profile(user_id):
     """Fetch user profile data by UID"""
     try:
-        ref = database.reference(f"USER_PROFILES/{user_id}")
+        ref = PROFILES_REF.child(user_id)
         user_data = ref.get()
         
         if user_data and isinstance(user_data, dict):
@@ -155,77 +424,97 @@ def fetch_user_profile(user_id):
         logging.error(f"Error fetching user profile {user_id}: {e}")
         return None
 
+# Only leaf reads (profiles, user payments) run here; tasks in this pool never
+# wait on other tasks in it, so it can't deadlock however many sessions share it
+@st.cache_resource
+def get_executor():
+    """Shared thread pool for running independent Firebase reads concurrently"""
+    return ThreadPoolExecutor(max_workers=8)
+
+_EXEC = get_executor()
+
+# Section prefetches get their own pool: the challengers fetch blocks on profile
+# reads in _EXEC (and on other sessions' cache_data locks), so running it in _EXEC
+# could tie up every worker waiting for tasks queued behind it
+@st.cache_resource
+def get_prefetch_executor():
+    """Thread pool for the dashboard's cold-load section fetches"""
+    return ThreadPoolExecutor(max_workers=4)
+
+_PREFETCH_EXEC = get_prefetch_executor()
+
+def fetch_user_bundle(user_id, limit=20):
+    """Fetch a user's profile and payment history in parallel (one round-trip of latency)"""
+    profile_future = _EXEC.submit(fetch_user_profile, user_id)
+    payments_future = _EXEC.submit(fetch_user_payments, user_id, limit)
+    return profile_future.result(), payments_future.result()
+
+# Profile fields the latest-users table actually shows; everything else is dropped
+# right after the read so it isn't cached, pickled or turned into DataFrame columns
+DISPLAY_USER_FIELDS = (
+    "UserName", "UserEmail", "UserCountry", "UserSource", "ClickId", "Platform",
+    "UserStatus", "AmountWon", "UserJoinDate", "UserActiveDate",
+)
+
+def _fetch_latest_users_indexed(limit):
+    """Latest `limit` users by UserJoinDate via the indexed query (raises on query errors)"""
+    # Use indexed query to get latest users by join date
+    users_data = get_with_retry(PROFILES_REF.order_by_child("UserJoinDate").limit_to_last(limit))
+    
+    if not users_data or not isinstance(users_data, dict):
+        logging.warning("No users data found")
+        return []
+    
+    # Convert to list with user IDs
+    users_list = [
+        {"user_id": user_id, **{k: user_data[k] for k in DISPLAY_USER_FIELDS if k in user_data}}
+        for user_id, user_data in users_data.items() if type(user_data) is dict
+    ]
+    
+    # The query returns users in ascending UserJoinDate order, so reversing
+    # gives most recent first without re-sorting
+    sorted_users = users_list[::-1]
+    
+    logging.info(f"Found {len(sorted_users)} latest users using indexed query")
+    return sorted_users
+
+@st.cache_data(ttl=60, show_spinner=False)
 def fetch_latest_users(limit=10):
-    """Fetch latest users sorted by UserJoinDate using indexed query"""
+    """Fetch latest users sorted by UserJoinDate, retrying the indexed query with backoff.
+
+    Returns None if the query failed (as opposed to [] when there are no users).
+    """
+    # No fallback scan of USER_PROFILES: that node grows with the whole user base
     try:
-        ref = database.reference("USER_PROFILES")
-        
-        # Use indexed query to get latest users by join date
-        query = ref.order_by_child("UserJoinDate").limit_to_last(limit)
-        users_data = query.get()
-        
-        if not users_data or not isinstance(users_data, dict):
-            logging.warning("No users data found")
-            return []
-        
-        # Convert to list with user IDs
-        users_list = []
-        for user_id, user_data in users_data.items():
-            if isinstance(user_data, dict):
-                user_record = {
-                    "user_id": user_id,
-                    **user_data
-                }
-                users_list.append(user_record)
-        
-        # Sort by UserJoinDate (most recent first)
-        sorted_users = sorted(
-            users_list,
-            key=lambda x: x.get("UserJoinDate", 0),
-            reverse=True
-        )
-        
-        logging.info(f"Found {len(sorted_users)} latest users using indexed query")
-        return sorted_users
-        
+        return _fetch_latest_users_indexed(limit)
     except Exception as e:
-        logging.error(f"Error fetching latest users with indexed query: {e}")
-        # Fallback to basic query if indexed query fails
-        try:
-            ref = database.reference("USER_PROFILES")
-            all_users = ref.get()
-            
-            if not all_users:
-                return []
-            
-            users_list = []
-            for user_id, user_data in all_users.items():
-                if isinstance(user_data, dict):
-                    user_record = {"user_id": user_id, **user_data}
-                    users_list.append(user_record)
-            
-            sorted_users = sorted(users_list, key=lambda x: x.get("UserJoinDate", 0), reverse=True)
-            return sorted_users[:limit]
-            
-        except Exception as fallback_error:
-            logging.error(f"Fallback query for latest users failed: {fallback_error}")
-            return []
+        logging.error(f"Error fetching latest users with indexed query (verify .indexOn UserJoinDate in Firebase rules): {e}")
+        return None
+
 
+# Profile fields the challengers table shows
+CHALLENGER_PROFILE_FIELDS = (
+    "UserName", "UserEmail", "UserCountry", "Platform", "UserStatus", "UserJoinDate",
+)
 
+@st.cache_data(ttl=60, show_spinner=False)
 def fetch_recent_challengers(limit=10):
-    """Fetch recent challengers (users who made completed payments) with their profile data"""
+    """Fetch recent challengers (users who made completed payments) with their profile data.
+
+    Returns None if reading the payments failed.
+    """
     try:
-        ref = database.reference("payments")
-        
-        # Debug: Try to get all payments first to see what we have
-        all_payments = ref.get()
-        logging.info(f"Total payments in database: {len(all_payments) if all_payments else 0}")
-        
-        # Use indexed query to get all completed payments efficiently
-        query = ref.order_by_child("status").equal_to("completed")
-        completed_payments = query.get()
+        # Reuse the cached read that also feeds the completed-payments section
+        completed_payments = fetch_recent_completed_payments(COMPLETED_PAYMENTS_WINDOW)
+        if completed_payments is None:
+            return None
         
-        logging.info(f"Raw completed payments query result: {completed_payments}")
+        distinct_users = {p.get("userId") for p in completed_payments.values()}
+        if len(completed_payments) >= COMPLETED_PAYMENTS_WINDOW and len(distinct_users) < limit:
+            # Window holds too few distinct payers; scan a much larger (capped) window instead
+            query = PAYMENTS_REF.order_by_child("status").equal_to("completed").limit_to_last(MAX_FALLBACK)
+            completed_payments = get_with_retry(query)
+            warn_if_capped(completed_payments, "Challengers payment scan")
         
         if not completed_payments:
             logging.info("No completed payments found for challengers")
@@ -237,44 +526,38 @@ def fetch_recent_challengers(limit=10):
         user_payment_map = {}  # Track latest payment per user
         
         for payment_id, payment_data in completed_payments.items():
-            logging.info(f"Processing payment {payment_id}: {payment_data}")
-            
-            if isinstance(payment_data, dict):
+            try:
                 user_id = payment_data.get("userId")
                 created_at = payment_data.get("processedAt", 0)
-                status = payment_data.get("status")
-                
-                logging.info(f"Payment {payment_id} - userId: {user_id}, status: {status}, processedAt: {created_at}")
-                
-                if user_id:  # Remove processedAt > 0 requirement for now
-                    # Keep track of the latest payment per user
-                    if user_id not in user_payment_map or created_at > user_payment_map[user_id]["processedAt"]:
-                        user_payment_map[user_id] = {
-                            "payment_id": payment_id,
-                            "processedAt": created_at,
-                            "amount": payment_data.get("amount", 0),
-                            "currency": payment_data.get("currency", "usd"),
-                            "challengeId": payment_data.get("challengeId", ""),
-                            **payment_data
-                        }
-                        logging.info(f"Added user {user_id} to payment map")
+            except AttributeError:
+                # Non-object child (e.g. a stray scalar) under /payments
+                continue
+            
+            if user_id:  # Remove processedAt > 0 requirement for now
+                # Keep track of the latest payment per user (one map lookup per payment)
+                latest = user_payment_map.get(user_id)
+                if latest is None or created_at > latest["processedAt"]:
+                    user_payment_map[user_id] = {
+                        "payment_id": payment_id,
+                        "processedAt": created_at,
+                        "amount": payment_data.get("amount", 0),
+                        "currency": payment_data.get("currency", "usd"),
+                        "challengeId": payment_data.get("challengeId", ""),
+                    }
         
         logging.info(f"Found {len(user_payment_map)} unique users with completed payments")
         
-        # Sort users by their latest payment time
-        sorted_user_payments = sorted(
-            user_payment_map.items(),
-            key=lambda x: x[1]["processedAt"],
-            reverse=True
-        )
+        # Top `limit` users by their latest payment time (no need to sort them all)
+        top_user_payments = heapq.nlargest(limit, user_payment_map.items(), key=lambda x: x[1]["processedAt"])
+        
+        # Fetch the top unique users' profiles concurrently
+        user_ids = [user_id for user_id, _ in top_user_payments]
+        logging.info(f"Fetching {len(user_ids)} challenger profiles")
+        profiles = _EXEC.map(fetch_user_profile, user_ids)
         
-        # Get the top unique users and fetch their profiles
         challengers = []
-        for user_id, payment_data in sorted_user_payments[:limit]:
-            # Fetch user profile
+        for (user_id, payment_data), user_profile in zip(top_user_payments, profiles):
             try:
-                logging.info(f"Fetching profile for challenger user: {user_id}")
-                user_profile = fetch_user_profile(user_id)
                 if user_profile:
                     challenger_record = {
                         "user_id": user_id,
@@ -283,10 +566,9 @@ def fetch_recent_challengers(limit=10):
                         "latest_payment_date": payment_data["processedAt"],
                         "latest_challenge_id": payment_data["challengeId"],
                         "currency": payment_data["currency"],
-                        **user_profile  # Add all user profile data
+                        **{k: user_profile[k] for k in CHALLENGER_PROFILE_FIELDS if k in user_profile}
                     }
                     challengers.append(challenger_record)
-                    logging.info(f"Added challenger: {user_profile.get('UserName', 'Unknown')} ({user_id})")
                 else:
                     logging.warning(f"No profile found for user {user_id}")
             except Exception as e:
@@ -297,108 +579,259 @@ def fetch_recent_challengers(limit=10):
         
     except Exception as e:
         logging.error(f"Error fetching recent challengers: {e}")
-        return []
+        return None
+
+def _observed_counts(column):
+    """value_counts as a dict, without the zero counts a categorical column
+    reports for categories absent from this slice of rows"""
+    counts = column.value_counts()
+    return counts[counts > 0].to_dict()
 
-def calculate_payment_stats(payments):
-    """Calculate basic statistics from payments data"""
-    if not payments:
+def calculate_payment_stats(df):
+    """Calculate basic statistics from an already-built payments DataFrame"""
+    if df.empty:
         return {}
     
-    df = pd.DataFrame(payments)
-    
-    stats = {}
-    if 'amount' in df.columns:
-        stats['total_amount'] = df['amount'].sum()
-        stats['average_amount'] = df['amount'].mean()
-        stats['count'] = len(df)
-    
-    if 'status' in df.columns:
-        status_counts = df['status'].value_counts().to_dict()
-        stats['status_breakdown'] = status_counts
-    
-    if 'currency' in df.columns:
-        currency_counts = df['currency'].value_counts().to_dict()
-        stats['currency_breakdown'] = currency_counts
-    
-    return stats
+    # `amount` is int64 (see _coerce_numeric): one NumPy pass for the total,
+    # and the mean follows from it instead of a second pass
+    total = df['amount'].to_numpy().sum()
+    return {
+        'total_amount': total,
+        'average_amount': total / len(df),
+        'count': len(df),
+        'status_breakdown': _observed_counts(df['status']),
+        'currency_breakdown': _observed_counts(df['currency']),
+    }
+
+def payments_cache_key(payments):
+    """Cheap hashable key identifying a {payment_id: payment} mapping.
+
+    Covers every field the frame is built from, so a payment whose status or
+    amount changes in place gets a new frame.
+    """
+    return tuple((pid, tuple(p.get(f) for f in PAYMENT_FIELDS)) for pid, p in payments.items())
+
+def _coerce_numeric(df):
+    """Cast amount/processedAt to int64 once so downstream math runs on NumPy arrays"""
+    for col in ("amount", "processedAt"):
+        # Round rather than truncate a stray fractional value (1999.9 -> 2000, not 1999)
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).round().astype('int64')
+    return df
+
+# Id string columns; Arrow stores them as contiguous UTF-8, which speeds up ==
+# and hashing versus object columns of Python strings
+PAYMENT_STRING_COLUMNS = ("payment_id", "userId", "challengeId")
+# A handful of distinct values each, so stored as small integer codes
+PAYMENT_CATEGORY_COLUMNS = ("status", "currency")
+
+def _coerce_strings(df):
+    """Store the id columns as PyArrow strings and status/currency as pandas categoricals"""
+    for col in PAYMENT_STRING_COLUMNS:
+        df[col] = df[col].astype("string[pyarrow]")
+    for col in PAYMENT_CATEGORY_COLUMNS:
+        df[col] = df[col].astype("category")
+    return df
+
+def records_to_df(records):
+    """Build an Arrow-backed DataFrame from a list of flat dicts"""
+    # pd.DataFrame takes columns from the union of keys across records; columns that
+    # mix types across records stay object dtype
+    return pd.DataFrame(records).convert_dtypes(dtype_backend="pyarrow")
+
+# Payment fields any table or stat reads; the rest (composite index keys, provider
+# metadata, ...) never become DataFrame columns. Every one of these is always a
+# column (all-NA when no payment has it), so nothing downstream checks for them.
+PAYMENT_FIELDS = ("userId", "amount", "currency", "status", "challengeId", "processedAt")
+
+def to_payments_df(payments):
+    """Build a payments DataFrame (most recent first) straight from a {payment_id: payment} mapping"""
+    df = pd.DataFrame.from_dict(payments, orient='index', columns=PAYMENT_FIELDS).rename_axis('payment_id').reset_index()
+    df = _coerce_strings(_coerce_numeric(df))
+    return df.sort_values("processedAt", ascending=False, kind="stable").reset_index(drop=True)
+
+# Cached as a shared resource (no hashing/copying of the DataFrame on reruns),
+# so callers must treat the returned DataFrame as read-only
+@st.cache_resource(max_entries=50, show_spinner=False)
+def build_payments_df(payments_key, _payments):
+    """Build the formatted payments DataFrame once per distinct set of payments"""
+    df = to_payments_df(_payments)
+    df["Formatted_Created"] = format_timestamp_series(df["processedAt"])
+    df["Amount_USD"] = cents_to_usd(df["amount"])
+    return df
+
+@st.cache_data(max_entries=50, show_spinner=False)
+def cached_payment_stats(stats_key, _df):
+    """calculate_payment_stats memoized on a cheap key identifying the rows of `_df`"""
+    return calculate_payment_stats(_df)
+
+# Columns each table surfaces, in display order; df.filter(items=...) keeps this
+# order and skips any column the data doesn't have
+USER_DISPLAY_COLS = (
+    "Formatted_Join_Date", "UserName", "UserEmail", "UserCountry", "UserSource", "ClickId",
+    "Platform", "UserStatus", "AmountWon", "Formatted_Active_Date", "user_id",
+)
+CHALLENGER_DISPLAY_COLS = (
+    "Formatted_Join_Date", "UserName", "UserEmail", "UserCountry", "Platform",
+    "Payment_Amount_USD", "currency", "latest_challenge_id",
+    "Formatted_Payment_Date", "UserStatus", "user_id",
+)
+PAYMENT_DISPLAY_COLS = (
+    "Formatted_Created", "userId", "Amount_USD",
+    "currency", "status", "challengeId", "payment_id",
+)
+USER_PAYMENT_DISPLAY_COLS = ("payment_id", "Amount_USD", "currency", "status", "challengeId", "Formatted_Created")
+
+# (label, profile field) pairs for the search panel's Basic Info column
+PROFILE_BASIC_FIELDS = (
+    ("Name", "UserName"), ("Email", "UserEmail"), ("Country", "UserCountry"),
+    ("Platform", "Platform"), ("Status", "UserStatus"),
+)
+
+PAGE_SIZE = 20
+
+def payments_table(df, columns):
+    """Display columns of a payments DataFrame, hiding fields no payment in it has"""
+    # The frame always carries every PAYMENT_FIELDS column; drop the all-NA ones so
+    # tables show only what the data holds
+    return df.filter(items=columns).dropna(axis=1, how="all")
+
+def paginated_dataframe(df, key, page_size=PAGE_SIZE, **kwargs):
+    """st.dataframe that only sends one page of rows to the browser per rerun"""
+    if len(df) <= page_size:
+        st.dataframe(df, **kwargs)
+        return
+    pages = -(-len(df) // page_size)
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key)
+    start = (page - 1) * page_size
+    st.dataframe(df.iloc[start:start + page_size], **kwargs)
+
+def prefetched(pending, key, fetch, *args):
+    """Result of the background fetch started for `key`, or a direct fetch if none was started"""
+    future = pending.pop(key, None)
+    return future.result() if future is not None else fetch(*args)
+
+def load_section(pending, key, spinner_text, fetch, *args):
+    """Section data from session_state, fetched on first use.
+
+    Only non-empty results are kept: a failed (None) or empty read is fetched
+    again on the next rerun, so the section recovers once the cached fetch expires.
+    """
+    if key in st.session_state:
+        return st.session_state[key]
+    with st.spinner(spinner_text):
+        result = prefetched(pending, key, fetch, *args)
+    if result:
+        st.session_state[key] = result
+    return result
 
 # --- STREAMLIT DASHBOARD ---
 st.title("Payments Dashboard")
 
+# Section data is kept in session_state, so reruns triggered by other widgets
+# (e.g. the user search) render from memory instead of calling the fetchers again
+SECTION_STATE_KEYS = ("latest_users", "challengers", "completed_payments")
+
+# Cached fetches are reused across reruns; this forces a fresh read from Firebase
+if st.button("🔄 Refresh Data"):
+    st.cache_data.clear()
+    for key in SECTION_STATE_KEYS:
+        st.session_state.pop(key, None)
+    st.rerun()
+
+# Start every section that still needs data at once, so a cold load waits for the
+# slowest read instead of their sum. Challengers reads the completed-payments
+# window itself, so that section then renders from the warm cache.
+pending = {}
+if "latest_users" not in st.session_state:
+    pending["latest_users"] = _PREFETCH_EXEC.submit(fetch_latest_users, 10)
+if "challengers" not in st.session_state:
+    pending["challengers"] = _PREFETCH_EXEC.submit(fetch_recent_challengers, 20)
+elif "completed_payments" not in st.session_state:
+    pending["completed_payments"] = _PREFETCH_EXEC.submit(fetch_recent_completed_payments, COMPLETED_PAYMENTS_WINDOW)
+
 # --- LATEST USERS SECTION ---
 st.header("👥 Latest 10 Users")
 
-with st.spinner("Loading latest users..."):
-    latest_users = fetch_latest_users(10)
+if st.button("🔄 Refresh users"):
+    fetch_latest_users.clear()
+    st.session_state.pop("latest_users", None)
+
+latest_users = load_section(pending, "latest_users", "Loading latest users...", fetch_latest_users, 10)
 
-if not latest_users:
+if latest_users is None:
+    st.error("Failed to load latest users from Firebase. They will be retried on the next refresh.")
+elif not latest_users:
     st.warning("No users found")
 else:
     # Create DataFrame from the latest users data
-    users_df = pd.DataFrame(latest_users)
+    users_df = records_to_df(latest_users)
     
     # Format the UserJoinDate to be more readable
     if "UserJoinDate" in users_df.columns:
-        users_df["Formatted_Join_Date"] = users_df["UserJoinDate"].apply(format_timestamp)
+        users_df["Formatted_Join_Date"] = format_timestamp_series(users_df["UserJoinDate"])
     
     if "UserActiveDate" in users_df.columns:
-        users_df["Formatted_Active_Date"] = users_df["UserActiveDate"].apply(format_timestamp)
+        users_df["Formatted_Active_Date"] = format_timestamp_series(users_df["UserActiveDate"])
     
     # Display key information in a clean table
-    display_cols = ["Formatted_Join_Date", "UserName", "UserEmail", "UserCountry", "UserSource","ClickId","Platform", "UserStatus", "AmountWon", "Formatted_Active_Date", "user_id"]
-    display_cols = [col for col in display_cols if col in users_df.columns]
-    
-    st.dataframe(users_df[display_cols], use_container_width=True)
+    paginated_dataframe(users_df.filter(items=USER_DISPLAY_COLS), "latest_users_page", use_container_width=True)
 
 st.divider()
 # --- LATEST 20 CHALLENGERS SECTION ---
 st.header("🎯 Latest 20 Challengers (Paying Users)")
 
-with st.spinner("Loading latest challengers..."):
-    challengers = fetch_recent_challengers(limit=20)
+if st.button("🔄 Refresh challengers"):
+    fetch_recent_challengers.clear()
+    fetch_recent_completed_payments.clear()
+    st.session_state.pop("challengers", None)
+
+challengers = load_section(pending, "challengers", "Loading latest challengers...", fetch_recent_challengers, 20)
 
-if not challengers:
+if challengers is None:
+    st.error("Failed to load challengers from Firebase. They will be retried on the next refresh.")
+elif not challengers:
     st.warning("No challengers found")
 else:
     # Turn into DataFrame
-    df = pd.DataFrame(challengers)
+    df = records_to_df(challengers)
 
     # Format the join date
     if "UserJoinDate" in df.columns:
-        df["Formatted_Join_Date"] = df["UserJoinDate"].apply(format_timestamp)
+        df["Formatted_Join_Date"] = format_timestamp_series(df["UserJoinDate"])
 
     # Format the latest payment date
     if "latest_payment_date" in df.columns:
-        df["Formatted_Payment_Date"] = df["latest_payment_date"].apply(format_timestamp)
+        df["Formatted_Payment_Date"] = format_timestamp_series(df["latest_payment_date"])
 
     # Format the payment amount
     if "latest_payment_amount" in df.columns:
-        df["Payment_Amount_USD"] = df["latest_payment_amount"].apply(
-            lambda x: f"${x/100:.2f}" if pd.notna(x) else "$0.00"
-        )
-
-    # Pick the columns you want to surface
-    display_cols = [
-        "Formatted_Join_Date", "UserName", "UserEmail", "UserCountry", "Platform",
-        "Payment_Amount_USD", "currency", "latest_challenge_id",
-        "Formatted_Payment_Date", "UserStatus", "user_id"
-    ]
-    display_cols = [c for c in display_cols if c in df.columns]
+        df["Payment_Amount_USD"] = cents_to_usd(df["latest_payment_amount"])
 
-    st.dataframe(df[display_cols], use_container_width=True)
+    paginated_dataframe(df.filter(items=CHALLENGER_DISPLAY_COLS), "challengers_page", use_container_width=True, column_config=USD_COLUMN_CONFIG)
 
 st.divider()
 
 # --- LATEST 20 COMPLETED PAYMENTS SECTION ---
 st.header("💸 Latest 20 Completed Payments")
 
-with st.spinner("Loading latest completed payments..."):
-    completed_payments = fetch_recent_completed_payments(limit=20)
+if st.button("🔄 Refresh payments"):
+    fetch_recent_completed_payments.clear()
+    st.session_state.pop("completed_payments", None)
+
+# Same cached read the challengers section already made
+completed_payments = load_section(
+    pending, "completed_payments", "Loading latest completed payments...",
+    fetch_recent_completed_payments, COMPLETED_PAYMENTS_WINDOW,
+)
 
-if not completed_payments:
+if completed_payments is None:
+    st.error("Failed to load completed payments from Firebase. They will be retried on the next refresh.")
+elif not completed_payments:
     st.warning("No completed payments found")
 else:
-    stats = calculate_payment_stats(completed_payments)
+    payments_key = payments_cache_key(completed_payments)
+    df = build_payments_df(payments_key, completed_payments).head(20)
+    stats = cached_payment_stats((payments_key, len(df)), df)
 
     # Summary metrics
     c1, c2, c3 = st.columns(3)
@@ -411,98 +844,92 @@ else:
         avg = stats.get("average_amount", 0)
         st.metric("Average Payment", f"${avg/100:.2f}")
 
-    # Build and display DataFrame
-    df = pd.DataFrame(completed_payments)
-    if "processedAt" in df.columns:
-        df["Formatted_Created"] = df["processedAt"].apply(format_timestamp)
-    if "amount" in df.columns:
-        df["Amount_USD"] = df["amount"].apply(lambda x: f"${x/100:.2f}" if pd.notna(x) else "$0.00")
-
-    display_cols = [
-        "Formatted_Created", "userId", "Amount_USD",
-        "currency", "status", "challengeId", "payment_id"
-    ]
-    display_cols = [c for c in display_cols if c in df.columns]
-
-    st.dataframe(df[display_cols], use_container_width=True)
+    # Display DataFrame
+    paginated_dataframe(payments_table(df, PAYMENT_DISPLAY_COLS), "completed_payments_page", use_container_width=True, column_config=USD_COLUMN_CONFIG)
 
 st.divider()
 
 # --- USER PROFILE SEARCH SECTION ---
 st.header("🔍 User Profile Search")
 
-user_id_input = st.text_input("Enter User ID to search:", placeholder="Enter UID here...")
-
-if user_id_input:
-    with st.spinner(f"Searching for user {user_id_input}..."):
-        user_profile = fetch_user_profile(user_id_input.strip())
-    
-    if user_profile:
-        st.success(f"User profile found for {user_id_input}")
-        
-        # Display user profile in a clean format
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.subheader("Basic Info")
-            st.write(f"**Name:** {user_profile.get('UserName', 'N/A')}")
-            st.write(f"**Email:** {user_profile.get('UserEmail', 'N/A')}")
-            st.write(f"**Country:** {user_profile.get('UserCountry', 'N/A')}")
-            st.write(f"**Platform:** {user_profile.get('Platform', 'N/A')}")
-            st.write(f"**Status:** {user_profile.get('UserStatus', 'N/A')}")
-        
-        with col2:
-            st.subheader("Activity & Stats")
-            st.write(f"**Amount Won:** ${user_profile.get('AmountWon', 0)}")
-            st.write(f"**Join Date:** {format_timestamp(user_profile.get('UserJoinDate', 0))}")
-            st.write(f"**Last Active:** {format_timestamp(user_profile.get('UserActiveDate', 0))}")
-            st.write(f"**Source:** {user_profile.get('UserSource', 'N/A')}")
-            st.write(f"**IP:** {user_profile.get('UserIP', 'N/A')}")
+# Runs as a fragment: submitting a search or paging its table reruns only this
+# section, not the rest of the dashboard
+@st.fragment
+def user_search_section():
+    """User-ID search form with the matching profile and payment history"""
+    # A form only reruns on submit, so typing a UID doesn't query Firebase per keystroke
+    with st.form("uid_search"):
+        user_id_input = st.text_input("Enter User ID to search:", placeholder="Enter UID here...")
+        submitted = st.form_submit_button("Search")
+
+    # Remember the last submitted UID so the result stays up across other reruns
+    if submitted:
+        st.session_state["search_uid"] = user_id_input.strip()
+    user_id_input = st.session_state.get("search_uid", "")
+
+    if user_id_input:
+        with st.spinner(f"Searching for user {user_id_input}..."):
+            user_profile, user_payments = fetch_user_bundle(user_id_input, 20)
         
-        # Fetch and display user's payment history
-        st.subheader("💳 Payment History")
-        with st.spinner(f"Loading payment history for {user_id_input}..."):
-            user_payments = fetch_user_payments(user_id_input.strip(), 20)
-        
-        if user_payments:
-            # Calculate user payment stats
-            user_payment_stats = calculate_payment_stats(user_payments)
+        if user_profile:
+            st.success(f"User profile found for {user_id_input}")
             
-            # Display user payment metrics
-            col1, col2, col3, col4 = st.columns(4)
-            with col1:
-                st.metric("Total Payments", user_payment_stats.get('count', 0))
-            with col2:
-                total_spent = user_payment_stats.get('total_amount', 0)
-                st.metric("Total Spent", f"${total_spent/100:.2f}")
-            with col3:
-                avg_payment = user_payment_stats.get('average_amount', 0)
-                st.metric("Avg Payment", f"${avg_payment/100:.2f}")
-            with col4:
-                completed_payments = user_payment_stats.get('status_breakdown', {}).get('completed', 0)
-                st.metric("Completed", completed_payments)
+            # Display user profile in a clean format
+            col1, col2 = st.columns(2)
             
-            # Display user payments table
-            user_payments_df = pd.DataFrame(user_payments)
+            with col1:
+                st.subheader("Basic Info")
+                # One markdown element per panel instead of one per field
+                st.markdown("\n\n".join(
+                    f"**{label}:** {user_profile.get(key, 'N/A')}" for label, key in PROFILE_BASIC_FIELDS
+                ))
             
-            if "processedAt" in user_payments_df.columns:
-                user_payments_df["Formatted_Created"] = user_payments_df["processedAt"].apply(format_timestamp)
+            with col2:
+                st.subheader("Activity & Stats")
+                st.markdown("\n\n".join((
+                    f"**Amount Won:** ${user_profile.get('AmountWon', 0)}",
+                    f"**Join Date:** {format_timestamp(user_profile.get('UserJoinDate', 0))}",
+                    f"**Last Active:** {format_timestamp(user_profile.get('UserActiveDate', 0))}",
+                    f"**Source:** {user_profile.get('UserSource', 'N/A')}",
+                    f"**IP:** {user_profile.get('UserIP', 'N/A')}",
+                )))
             
-            if "amount" in user_payments_df.columns:
-                user_payments_df["Amount_USD"] = user_payments_df["amount"].apply(lambda x: f"${x/100:.2f}" if pd.notna(x) else "$0.00")
+            # Fetch and display user's payment history
+            st.subheader("💳 Payment History")
             
-            display_cols = ["payment_id", "Amount_USD", "currency", "status", "challengeId", "Formatted_Created"]
-            display_cols = [col for col in display_cols if col in user_payments_df.columns]
+            if user_payments:
+                user_payments_key = payments_cache_key(user_payments)
+                user_payments_df = build_payments_df(user_payments_key, user_payments)
+                
+                # Calculate user payment stats
+                user_payment_stats = cached_payment_stats((user_payments_key, len(user_payments_df)), user_payments_df)
+                
+                # Display user payment metrics
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Total Payments", user_payment_stats.get('count', 0))
+                with col2:
+                    total_spent = user_payment_stats.get('total_amount', 0)
+                    st.metric("Total Spent", f"${total_spent/100:.2f}")
+                with col3:
+                    avg_payment = user_payment_stats.get('average_amount', 0)
+                    st.metric("Avg Payment", f"${avg_payment/100:.2f}")
+                with col4:
+                    completed_count = user_payment_stats.get('status_breakdown', {}).get('completed', 0)
+                    st.metric("Completed", completed_count)
+                
+                # Display user payments table
+                paginated_dataframe(payments_table(user_payments_df, USER_PAYMENT_DISPLAY_COLS), "user_payments_page", use_container_width=True, column_config=USD_COLUMN_CONFIG)
+            else:
+                st.info("No payment history found for this user.")
             
-            st.dataframe(user_payments_df[display_cols], use_container_width=True)
+            # Show raw data in expandable section
+            with st.expander("View Raw Profile Data"):
+                st.json(user_profile)
         else:
-            st.info("No payment history found for this user.")
-        
-        # Show raw data in expandable section
-        with st.expander("View Raw Profile Data"):
-            st.json(user_profile)
-    else:
-        st.error(f"No user profile found for UID: {user_id_input}")
+            st.error(f"No user profile found for UID: {user_id_input}")
+
+user_search_section()
 
 
 st.divider()
\ No newline at end of file